@@ -7,6 +7,26 @@ from .openai import OpenAIAgent
 from .ollama import OllamaAgent
 from .google import GeminiAgent
 
+# provider -> (agent class, config attribute holding its default model)
+_AGENTS = {
+    "openai": (OpenAIAgent, "OPENAI_MODEL"),
+    "google": (GeminiAgent, "GOOGLE_MODEL"),
+    "gemini": (GeminiAgent, "GOOGLE_MODEL"),
+    "ollama": (OllamaAgent, "OLLAMA_MODEL"),
+}
+
+# model-name prefix -> agent class, used when only a model name is given
+_MODEL_PREFIXES = (
+    ("gpt", OpenAIAgent),
+    ("o1", OpenAIAgent),
+    ("gemini", GeminiAgent),
+)
+
+def _create(cls, model: str, tools: List[Callable]) -> BaseAgent:
+    if cls is OllamaAgent:
+        return cls(model, tools, api_base=config.OLLAMA_URL)
+    return cls(model, tools)
+
 def get_agent(tools: List[Callable], model_name: Optional[str] = None, provider: Optional[str] = None) -> BaseAgent:
     """Factory to get the correct agent implementation. Uses config defaults."""
     
@@ -14,27 +34,17 @@ def get_agent(tools: List[Callable], model_name: Optional[str] = None, provider:
     provider = provider or config.DEFAULT_PROVIDER
     
     # 2. Map Provider to Agent & Default Model
-    if provider == "openai":
-        model = model_name or config.OPENAI_MODEL
-        logger.info(f"Factory: Creating OpenAIAgent with {model}")
-        return OpenAIAgent(model, tools)
-        
-    if provider == "google" or provider == "gemini":
-        model = model_name or config.GOOGLE_MODEL
-        logger.info(f"Factory: Creating GeminiAgent with {model}")
-        return GeminiAgent(model, tools)
-        
-    if provider == "ollama":
-        model = model_name or config.OLLAMA_MODEL
-        logger.info(f"Factory: Creating OllamaAgent with {model}")
-        return OllamaAgent(model, tools, api_base=config.OLLAMA_URL)
+    if provider in _AGENTS:
+        cls, model_attr = _AGENTS[provider]
+        model = model_name or getattr(config, model_attr)
+        logger.info(f"Factory: Creating {cls.__name__} with {model}")
+        return _create(cls, model, tools)
 
     # Fallback to auto-detect if someone passed model_name but no provider
     if model_name:
-        if model_name.startswith("gpt") or model_name.startswith("o1"):
-            return OpenAIAgent(model_name, tools)
-        if model_name.startswith("gemini"):
-            return GeminiAgent(model_name, tools)
-        return OllamaAgent(model_name, tools, api_base=config.OLLAMA_URL)
+        for prefix, cls in _MODEL_PREFIXES:
+            if model_name.startswith(prefix):
+                return _create(cls, model_name, tools)
+        return _create(OllamaAgent, model_name, tools)
         
     raise ValueError(f"Unknown provider: {provider}")
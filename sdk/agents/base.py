@@ -1,3 +1,4 @@
+import functools
 import inspect
 import json
 import uuid
@@ -5,10 +6,14 @@ from abc import ABC, abstractmethod
 from typing import List, Callable, Any, Dict, Optional
 from dataclasses import dataclass, field
 from loguru import logger
+import sdk.config as config
 
 # --- Tools Schema Helper ---
+_JSON_TYPES = {int: "integer", float: "number", bool: "boolean"}
+
+@functools.lru_cache(maxsize=None)
 def get_function_schema(func: Callable) -> dict:
-    """Generate OpenAI-compatible tool schema from a function."""
+    """Generate OpenAI-compatible tool schema from a function (cached per function)."""
     doc = func.__doc__ or ""
     sig = inspect.signature(func)
     parameters = {
@@ -18,13 +23,7 @@ def get_function_schema(func: Callable) -> dict:
     }
     
     for name, param in sig.parameters.items():
-        param_type = "string" # Default
-        if param.annotation == int:
-            param_type = "integer"
-        elif param.annotation == float:
-            param_type = "number"
-        elif param.annotation == bool:
-            param_type = "boolean"
+        param_type = _JSON_TYPES.get(param.annotation, "string")
             
         parameters["properties"][name] = {
             "type": param_type,
@@ -49,11 +48,18 @@ class ToolRequest:
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
 class BaseAgent(ABC):
+    # Short provider name shown in the bot UI
+    provider_label = "Unknown"
+    # Whether confirmed tool requests can be run via execute_tool()
+    supports_direct_tools = True
+
     def __init__(self, model_name: str, tools: List[Callable]):
         self.model_name = model_name
         self.tools = tools
         self.tool_map = {f.__name__: f for f in tools}
         self.tool_schemas = [get_function_schema(f) for f in tools]
+        # Built once; chat-completion style agents prepend it to the history
+        self._system_msg = {"role": "system", "content": config.SYSTEM_PROMPT}
 
     @abstractmethod
     async def chat(self, user_id: str, message: str) -> str | ToolRequest:
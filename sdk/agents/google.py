@@ -2,12 +2,15 @@ from typing import List, Callable, Any, Optional
 import google.generativeai as genai
 from loguru import logger
 import sdk.config as config
+from sdk import memory
 from .base import BaseAgent, ToolRequest
 
 class GeminiAgent(BaseAgent):
     """
     Agent using Google's Generative AI SDK (Gemini).
     """
+    provider_label = "Gemini"
+
     def __init__(self, model_name: str, tools: List[Callable], api_key: Optional[str] = None):
         super().__init__(model_name, tools)
         self.api_key = api_key or config.GOOGLE_API_KEY
@@ -18,24 +21,20 @@ class GeminiAgent(BaseAgent):
         # Gemini accepts functions directly in 'tools'
         self.model = genai.GenerativeModel(
             model_name=model_name, 
-            tools=tools,
+            tools=list(tools),
             system_instruction=config.SYSTEM_PROMPT
         )
 
     async def chat(self, user_id: str, message: str) -> str | ToolRequest:
-        from sdk import memory
-        
         # Add user message to memory
         memory.add_message(user_id, "user", message)
         
         # Build context from history
-        history = memory.get_history(user_id)
+        history = memory.get_gemini_history(user_id)
         
-        # Start chat session with history
-        chat = self.model.start_chat(history=[
-            {"role": m["role"] if m["role"] != "assistant" else "model", "parts": [m["content"]]} 
-            for m in history[:-1] # All except the current message which is passed to send_message
-        ])
+        # Start chat session with history, already stored in Gemini's shape.
+        # All except the current message which is passed to send_message
+        chat = self.model.start_chat(history=history[:-1])
         
         logger.info(f"Gemini (context: {len(history)}) Request: {message}")
         
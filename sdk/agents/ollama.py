@@ -1,28 +1,34 @@
+import functools
 from typing import List, Callable, Any, Optional
 import ollama
 from loguru import logger
+from sdk import memory
 from .base import BaseAgent, ToolRequest
 
+@functools.lru_cache(maxsize=8)
+def _get_client(host: Optional[str]) -> ollama.AsyncClient:
+    """One AsyncClient (and connection pool) per Ollama host, shared across agents."""
+    return ollama.AsyncClient(host=host)
+
 class OllamaAgent(BaseAgent):
     """
     Lightweight agent using official Ollama SDK for local models.
     Supports interactive confirmation and direct output.
     """
+    provider_label = "Ollama"
+
     def __init__(self, model_name: str, tools: List[Callable], api_base: Optional[str] = None):
         super().__init__(model_name, tools)
         self.api_base = api_base
-        self.client = ollama.AsyncClient(host=api_base)
+        self.client = _get_client(api_base)
 
     async def chat(self, user_id: str, message: str) -> Any:
-        from sdk import memory
         memory.add_message(user_id, "user", message)
         
         history = memory.get_history(user_id)
         
-        messages = [
-            {"role": "system", "content": config.SYSTEM_PROMPT}
-        ]
-        messages.extend(history)
+        messages = [self._system_msg]
+        messages += history
         
         logger.info(f"Ollama (context: {len(history)}) Request: {message}")
         try:
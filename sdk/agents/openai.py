@@ -1,44 +1,48 @@
+import functools
 import json
 from typing import List, Callable, Any, Optional
 import openai
 from loguru import logger
 import sdk.config as config
+from sdk import memory
 from .base import BaseAgent, ToolRequest
 
+@functools.lru_cache(maxsize=8)
+def _get_client(api_key: Optional[str]) -> openai.AsyncOpenAI:
+    """One AsyncOpenAI (and connection pool) per API key, shared across agents."""
+    return openai.AsyncOpenAI(api_key=api_key)
+
 class OpenAIAgent(BaseAgent):
     """
     Stateless agent using official OpenAI SDK.
     """
+    provider_label = "OpenAI"
+
     def __init__(self, model_name: str, tools: List[Callable], api_key: Optional[str] = None):
         super().__init__(model_name, tools)
-        self.client = openai.AsyncOpenAI(api_key=api_key or config.OPENAI_API_KEY)
+        self.client = _get_client(api_key or config.OPENAI_API_KEY)
+        
+        # Everything but the messages is fixed per agent, so build the call arguments once
+        self._request_kwargs = {
+            "model": self.model_name,
+            "tools": self.tool_schemas if self.tool_schemas else None,
+            "tool_choice": "auto" if self.tool_schemas else None
+        }
+        # Add reasoning_effort for supported models (gpt-5 or o1)
+        if "gpt-5" in self.model_name or "o1" in self.model_name:
+            self._request_kwargs["reasoning_effort"] = config.OPENAI_REASONING_EFFORT
 
     async def chat(self, user_id: str, message: str) -> Any:
-        from sdk import memory
         memory.add_message(user_id, "user", message)
         
         history = memory.get_history(user_id)
         
-        messages = [
-            {"role": "system", "content": config.SYSTEM_PROMPT}
-        ]
-        messages.extend(history)
+        messages = [self._system_msg]
+        messages += history
         
         logger.info(f"OpenAI (context: {len(history)}) Request: {message}")
         try:
-            # Prepare call arguments
-            kwargs = {
-                "model": self.model_name,
-                "messages": messages,
-                "tools": self.tool_schemas if self.tool_schemas else None,
-                "tool_choice": "auto" if self.tool_schemas else None
-            }
-            
-            # Add reasoning_effort for supported models (gpt-5 or o1)
-            if "gpt-5" in self.model_name or "o1" in self.model_name:
-                kwargs["reasoning_effort"] = config.OPENAI_REASONING_EFFORT
-
-            response = await self.client.chat.completions.create(**kwargs)
+            response = await self.client.chat.completions.create(messages=messages, **self._request_kwargs)
             
             choice = response.choices[0]
             msg = choice.message
@@ -1,8 +1,41 @@
-import httpx
+import asyncio
 import urllib.parse
+from functools import lru_cache, partial
+import httpx
 import sdk.config as config
+import sdk.http
 from loguru import logger
 
+# Titles repeat a lot ("SMS: <phone>", "High CPU Temp"), so memoize their quoting
+_quote_title = lru_cache(maxsize=256)(partial(urllib.parse.quote, safe=""))
+
+# Longer bodies are split into several notifications
+MAX_BODY_CHARS = 4000
+# Attempts per notification; waits 1s, 2s, ... (capped at 10s) between them
+SEND_ATTEMPTS = 3
+
+def _split_body(body: str) -> list[str]:
+    """Split body into chunks of at most MAX_BODY_CHARS, preferring paragraph breaks."""
+    if len(body) <= MAX_BODY_CHARS:
+        return [body]
+    chunks = []
+    current = ""
+    for para in body.split("\n\n"):
+        while len(para) > MAX_BODY_CHARS:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(para[:MAX_BODY_CHARS])
+            para = para[MAX_BODY_CHARS:]
+        if current and len(current) + 2 + len(para) > MAX_BODY_CHARS:
+            chunks.append(current)
+            current = para
+        else:
+            current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
 class BarkClient:
     def __init__(self, url: str = None):
         self.url = url or config.BARK_URL
@@ -11,22 +44,12 @@ class BarkClient:
 
     async def send(self, body: str, title: str = None, group: str = None, level: str = None, url: str = None):
         """
-        Send a notification via Bark.
+        Send a notification via Bark (split into parts if the body is long; retried on transient errors).
         """
         if not self.url:
             logger.warning("Bark API URL is not set. Notification skipped.")
             return
 
-        # Encode params to be safe for URL components
-        safe_body = urllib.parse.quote(body)
-        safe_title = urllib.parse.quote(title) if title else None
-
-        endpoint = self.url
-        if safe_title:
-            endpoint += f"/{safe_title}/{safe_body}"
-        else:
-            endpoint += f"/{safe_body}"
-
         params = {}
         if group:
             params["group"] = group
@@ -35,12 +58,40 @@ class BarkClient:
         if url:
             params["url"] = url
 
-        async with httpx.AsyncClient() as client:
+        chunks = _split_body(body)
+        for i, chunk in enumerate(chunks, 1):
+            # No "/" in the suffix: it would survive quoting and split the Bark path
+            part_title = f"{title} ({i} of {len(chunks)})" if title and len(chunks) > 1 else title
+            await self._send_one(chunk, part_title, params)
+
+    async def _send_one(self, body: str, title: str, params: dict):
+        # Encode params to be safe for URL components
+        # Path segments: "/" must be escaped too, or Bark reads it as a separator
+        safe_body = urllib.parse.quote(body, safe="")
+        safe_title = _quote_title(title) if title else None
+
+        endpoint = self.url
+        if safe_title:
+            endpoint += f"/{safe_title}/{safe_body}"
+        else:
+            endpoint += f"/{safe_body}"
+
+        for attempt in range(SEND_ATTEMPTS):
             try:
-                resp = await client.get(endpoint, params=params)
+                resp = await sdk.http.get().get(endpoint, params=params, timeout=5.0)
                 resp.raise_for_status()
                 logger.info(f"Bark notification sent: {title}")
+                return
+            except httpx.HTTPStatusError as e:
+                # Client errors won't fix themselves; only retry throttling and server errors
+                if e.response.status_code < 500 and e.response.status_code != 429:
+                    logger.error(f"Failed to send Bark notification: {e}")
+                    return
+                error = e
             except Exception as e:
-                logger.error(f"Failed to send Bark notification: {e}")
+                error = e
+            if attempt < SEND_ATTEMPTS - 1:
+                await asyncio.sleep(min(2 ** attempt, 10))
+        logger.error(f"Failed to send Bark notification after {SEND_ATTEMPTS} attempts: {error}")
 
 bark = BarkClient()
@@ -0,0 +1,22 @@
+import httpx
+from typing import Optional
+
+# Single connection pool shared by every outbound HTTP caller in the SDK.
+_client: Optional[httpx.AsyncClient] = None
+
+def get() -> httpx.AsyncClient:
+    """Return the shared AsyncClient, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=30)
+        )
+    return _client
+
+async def aclose():
+    """Close the shared client. Call once on service shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,5 +1,5 @@
-import httpx
 import sdk.config as config
+import sdk.http
 from loguru import logger
 
 class LLMClient:
@@ -10,35 +10,31 @@ class LLMClient:
         """
         Generate text using Ollama. (Currently unused/disabled in business logic)
         """
-        url = f"{self.base_url}/api/generate"
         payload = {
             "model": model,
             "prompt": prompt,
             "stream": False
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.post(url, json=payload, timeout=60.0)
-                resp.raise_for_status()
-                data = resp.json()
-                return data.get("response", "")
-            except Exception as e:
-                logger.error(f"LLM Generation failed: {e}")
-                return ""
+        try:
+            resp = await sdk.http.get().post(f"{self.base_url}/api/generate", json=payload)
+            resp.raise_for_status()
+            data = resp.json()
+            return data.get("response", "")
+        except Exception as e:
+            logger.error(f"LLM Generation failed: {e}")
+            return ""
 
 
 # New Capability: Model Listing
+import time
 import ollama
 
-async def get_available_models() -> list[dict]:
-    """
-    Get list of available models with metadata.
-    Returns: [{'provider': str, 'model': str, 'label': str}]
-    """
+MODELS_CACHE_TTL = 30.0
+
+def _configured_models() -> list[dict]:
+    """Configured defaults (High Priority). Config is static, so built once at import."""
     results = []
-    
-    # 1. Configured Defaults (High Priority)
     if config.OPENAI_API_KEY:
         results.append({
             "provider": "openai", 
@@ -57,12 +53,30 @@ async def get_available_models() -> list[dict]:
             "model": config.OLLAMA_MODEL, 
             "label": f"🤖 Ollama ({config.OLLAMA_MODEL})"
         })
+    return results
+
+_DEFAULT_MODELS = _configured_models()
+# Shared client so repeated /agent menus reuse the Ollama connection
+_ollama_client = ollama.AsyncClient(host=config.OLLAMA_URL)
+# (monotonic timestamp, models) of the last successful listing (-inf: never, so the first call always fetches)
+_models_cache: tuple[float, list[dict]] = (float("-inf"), [])
+
+async def get_available_models() -> list[dict]:
+    """
+    Get list of available models with metadata.
+    Results are cached for MODELS_CACHE_TTL seconds.
+    Returns: [{'provider': str, 'model': str, 'label': str}]
+    """
+    global _models_cache
+    if time.monotonic() - _models_cache[0] < MODELS_CACHE_TTL:
+        return _models_cache[1]
+
+    # 1. Configured Defaults (High Priority)
+    results = list(_DEFAULT_MODELS)
 
     # 2. Other local Ollama models
     try:
-        from ollama import AsyncClient
-        client = AsyncClient(host=config.OLLAMA_URL)
-        resp = await client.list()
+        resp = await _ollama_client.list()
         if 'models' in resp:
             for m in resp['models']:
                 name = m['name']
@@ -76,5 +90,8 @@ async def get_available_models() -> list[dict]:
                 })
     except Exception as e:
         logger.error(f"Failed to list additional Ollama models: {e}")
+        # Don't cache a partial list; retry on the next call
+        return results
         
+    _models_cache = (time.monotonic(), results)
     return results
@@ -1,29 +1,43 @@
+from collections import deque
+from itertools import islice
 from typing import List, Dict, Any
 from loguru import logger
 
 # Simple in-memory storage for now. 
 # Could be extended to JSON files for persistence if needed later.
-_history: Dict[str, List[Dict[str, str]]] = {}
+# Keep history bounded to avoid OOM or context limit issues; deque drops the oldest in O(1).
+MAX_HISTORY = 50
+_history: Dict[str, deque] = {}
+# Same messages kept in Gemini's {"role": "user"|"model", "parts": [...]} shape,
+# appended alongside _history so GeminiAgent doesn't re-map the history every turn.
+_gemini_history: Dict[str, deque] = {}
 
 def get_history(user_id: str, limit: int = 20) -> List[Dict[str, str]]:
     """Retrieve the last N messages for a user."""
-    return _history.get(str(user_id), [])[-limit:]
+    dq = _history.get(str(user_id))
+    if not dq:
+        return []
+    return list(islice(dq, max(0, len(dq) - limit), None))
+
+def get_gemini_history(user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Retrieve the last N messages for a user in Gemini's content shape."""
+    dq = _gemini_history.get(str(user_id))
+    if not dq:
+        return []
+    return list(islice(dq, max(0, len(dq) - limit), None))
 
 def add_message(user_id: str, role: str, content: str):
     """Add a message to the user's history."""
     uid = str(user_id)
-    if uid not in _history:
-        _history[uid] = []
-    
-    _history[uid].append({"role": role, "content": content})
-    
-    # Keep history bounded to avoid OOM or context limit issues
-    if len(_history[uid]) > 50:
-        _history[uid] = _history[uid][-50:]
+    _history.setdefault(uid, deque(maxlen=MAX_HISTORY)).append({"role": role, "content": content})
+    _gemini_history.setdefault(uid, deque(maxlen=MAX_HISTORY)).append(
+        {"role": "model" if role == "assistant" else role, "parts": [content]}
+    )
 
 def clear_history(user_id: str):
     """Clear the history for a specific user."""
     uid = str(user_id)
     if uid in _history:
-        _history[uid] = []
+        _history[uid].clear()
+        _gemini_history[uid].clear()
         logger.info(f"Memory cleared for user {uid}")
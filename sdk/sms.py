@@ -1,119 +1,231 @@
 import asyncio
+import ctypes
+import heapq
 import os
-import re
+import struct
+import sys
+import threading
+import time
 import aiofiles
+from collections import deque
+from dataclasses import dataclass
+from itertools import groupby
+from operator import itemgetter
 from typing import Dict, Tuple, Optional, AsyncGenerator
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from loguru import logger
 
-# Regex for standard Gammu filename
+# Standard Gammu filename, fixed layout apart from the phone number:
 # IN20251210_001000_00_123456789_00.txt
-FILENAME_PATTERN = re.compile(r"^IN(\d{8})_(\d{6})_(\d{2})_(.*)_(\d{2})\.txt$")
+#   [2:10] date, [11:17] time, [18:20] serial, [21:-7] phone, [-6:-4] seq
+# Shortest valid name (empty phone)
+MIN_FILENAME_LEN = 28
 INBOX_PATH = "/var/spool/gammu/inbox"
 
-def parse_filename(filename: str) -> Optional[dict]:
+# inotify(7): fire once a file is fully written (or moved in), not on creation
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+# struct inotify_event header: wd, mask, cookie, len (name follows)
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+def parse_filename(filename: str | bytes) -> Optional[dict]:
     """
-    Pure utility: Parse a Gammu filename into components.
+    Pure utility: Parse a Gammu filename (str or bytes) into components.
     Returns dict or None.
     """
-    match = FILENAME_PATTERN.match(filename)
-    if not match:
+    if isinstance(filename, str):
+        filename = os.fsencode(filename)
+    # Rejects lockfiles, partial writes, etc. before any slicing
+    if len(filename) < MIN_FILENAME_LEN or not (filename.startswith(b"IN") and filename.endswith(b".txt")):
         return None
-        
-    date_str, time_str, serial, phone, seq_str = match.groups()
+    date_str, time_str, serial, seq_str = filename[2:10], filename[11:17], filename[18:20], filename[-6:-4]
+    # bytes.isdigit() only accepts ASCII 0-9
+    if not (date_str.isdigit() and time_str.isdigit() and serial.isdigit() and seq_str.isdigit()):
+        return None
+    if filename[10:11] != b"_" or filename[17:18] != b"_" or filename[20:21] != b"_" or filename[-7:-6] != b"_":
+        return None
+    phone = filename[21:-7]
     return {
-        "date": date_str,
-        "time": time_str,
-        "serial": serial,
-        "phone": phone,
+        "date": date_str.decode(),
+        "time": time_str.decode(),
+        "serial": serial.decode(),
+        "phone": os.fsdecode(phone),
         "seq": int(seq_str)
     }
 
+@dataclass(slots=True)
+class _Buffer:
+    parts: dict # seq -> filepath; a re-delivered part lands in the same slot
+    first: float # loop.time() of the first part
+    deadline: float # loop.time() to flush at
+
 class SMSAssembler:
     def __init__(self, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
-        self.buffer: Dict[Tuple[str, str], dict] = {} # (phone, serial) -> {parts: [], timer: handle}
+        self.buffers: Dict[Tuple[str, str], _Buffer] = {} # (phone, serial) -> _Buffer
+        # (deadline, key) min-heap; entries go stale when a key's deadline moves and are skipped
+        self._heap: list = []
         self.queue = queue
         self.loop = loop
-        self.timeout = 5.0
+        self.timeout = 5.0 # Quiet period after the latest part
+        self.max_wait = 30.0 # Hard cap after the first part, even if parts keep trickling in
+        self._sweeper: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
 
-    async def _flush_buffer(self, key):
-        if key not in self.buffer: return
-        data = self.buffer.pop(key)
-        
-        parts = sorted(data['parts'], key=lambda x: x[0])
-        full_text = "".join([p[1] for p in parts])
-        phone, _ = key
+    def _flush_buffer(self, key):
+        buf = self.buffers.pop(key, None)
+        if buf is None: return
+        paths = [buf.parts[seq] for seq in sorted(buf.parts)]
+        task = self.loop.create_task(self._emit(key[0], paths))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _emit(self, phone: str, paths: list):
+        # All parts of the message are read concurrently, once, at flush time
+        texts = await asyncio.gather(*[_read_text(p) for p in paths])
+        full_text = "".join(texts)
         
         logger.info(f"SMS assembled from {phone}, yielding to generator.")
-        await self.queue.put((phone, full_text))
+        self.queue.put_nowait((phone, full_text))
 
-    def add_part(self, phone: str, serial: str, seq: int, text: str):
-        key = (phone, serial)
-        if key not in self.buffer:
-            self.buffer[key] = {'parts': [], 'timer': None}
+    def _sweep(self):
+        """Flush every message whose deadline has passed, then re-arm for the next one."""
+        self._sweeper = None
+        now = self.loop.time()
+        while self._heap and self._heap[0][0] <= now:
+            deadline, key = heapq.heappop(self._heap)
+            buf = self.buffers.get(key)
+            if buf is not None and buf.deadline == deadline:
+                self._flush_buffer(key)
         
-        self.buffer[key]['parts'].append((seq, text))
-        
-        # Debounce logic
-        if self.buffer[key]['timer']:
-            self.buffer[key]['timer'].cancel()
-            
-        self.buffer[key]['timer'] = self.loop.call_later(
-            self.timeout, 
-            lambda: asyncio.create_task(self._flush_buffer(key))
-        )
+        if self._heap:
+            self._sweeper = self.loop.call_at(self._heap[0][0], self._sweep)
 
-async def _read_and_assemble(filepath: str, assembler: SMSAssembler):
-    filename = os.path.basename(filepath)
-    meta = parse_filename(filename)
-    if not meta: return
+    def add_part(self, phone: str, serial: str, seq: int, filepath: str):
+        key = (phone, serial)
+        now = self.loop.time()
+        buf = self.buffers.get(key)
+        if buf is None:
+            buf = self.buffers[key] = _Buffer({}, now, now)
+        if seq in buf.parts:
+            logger.debug(f"Duplicate SMS part {seq} from {phone}, keeping latest")
+        buf.parts[seq] = filepath
+        
+        # Debounce logic: just move the deadline, the single sweeper picks it up.
+        # Deadlines only ever move later, so an armed sweeper is never late.
+        buf.deadline = min(now + self.timeout, buf.first + self.max_wait)
+        heapq.heappush(self._heap, (buf.deadline, key))
+        if self._sweeper is None:
+            self._sweeper = self.loop.call_at(self._heap[0][0], self._sweep)
 
+async def _read_text(filepath: str) -> str:
     try:
         async with aiofiles.open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-            content = await f.read()
-            
-        assembler.add_part(
-            phone=meta['phone'],
-            serial=meta['serial'],
-            seq=meta['seq'],
-            text=content
-        )
+            return await f.read()
     except Exception as e:
-        logger.error(f"Failed to process {filename}: {e}")
+        logger.error(f"Failed to process {os.path.basename(filepath)}: {e}")
+        return ""
 
 class _WatchdogHandler(FileSystemEventHandler):
-    def __init__(self, loop, assembler):
+    """Fallback watcher: batches observer-thread events into one loop wakeup per burst."""
+    def __init__(self, loop, on_file):
         self.loop = loop
-        self.assembler = assembler
+        self.on_file = on_file
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._scheduled = False
 
     def on_created(self, event):
-        if not event.is_directory:
-            self.loop.call_soon_threadsafe(
-                lambda: asyncio.create_task(_read_and_assemble(event.src_path, self.assembler))
-            )
+        if event.is_directory: return
+        self._pending.append(event.src_path)
+        with self._lock:
+            if self._scheduled: return
+            self._scheduled = True
+        self.loop.call_soon_threadsafe(self._drain)
+
+    def _drain(self):
+        # Runs in the loop thread; anything appended after the flag reset schedules a new drain
+        with self._lock:
+            self._scheduled = False
+        while self._pending:
+            self.on_file(self._pending.popleft())
+
+class _Inotify:
+    """Minimal non-blocking inotify watch on a single directory (Linux, via libc)."""
+    def __init__(self, path: str, mask: int):
+        libc = ctypes.CDLL(None, use_errno=True)
+        # IN_NONBLOCK / IN_CLOEXEC share their values with O_NONBLOCK / O_CLOEXEC
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {path}")
+
+    def read_names(self) -> list[str]:
+        """Drain all pending events and return the affected file names."""
+        names = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(data):
+                _wd, _mask, _cookie, length = _INOTIFY_EVENT.unpack_from(data, offset)
+                offset += _INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if name:
+                    names.append(os.fsdecode(name))
+
+    def close(self):
+        os.close(self.fd)
 
 async def monitor_inbox() -> AsyncGenerator[Tuple[str, str], None]:
     """
     Async Generator that yields (phone, text) tuples as SMS messages are received.
-    Manages its own Watchdog Observer.
+    Watches the inbox with inotify on Linux (read in-loop), Watchdog elsewhere.
     """
-    if not os.path.exists(INBOX_PATH):
-        try:
-            os.makedirs(INBOX_PATH)
-        except OSError:
-            logger.error(f"Could not create inbox: {INBOX_PATH}")
-            return
+    try:
+        # Filesystem probe off the loop; the spool may sit on a slow SD card
+        await asyncio.to_thread(os.makedirs, INBOX_PATH, exist_ok=True)
+    except OSError:
+        logger.error(f"Could not create inbox: {INBOX_PATH}")
+        return
 
     loop = asyncio.get_running_loop()
     queue = asyncio.Queue()
     assembler = SMSAssembler(queue, loop)
-    
-    observer = Observer()
-    handler = _WatchdogHandler(loop, assembler)
-    observer.schedule(handler, INBOX_PATH, recursive=False)
-    observer.start()
-    logger.info(f"Started SMS Watchdog on {INBOX_PATH}")
+
+    def on_file(path: str):
+        # Only the path is buffered here; the content is read when the message is flushed
+        meta = parse_filename(os.path.basename(path))
+        if meta:
+            assembler.add_part(meta['phone'], meta['serial'], meta['seq'], path)
+
+    inotify = None
+    observer = None
+    if sys.platform == "linux":
+        try:
+            inotify = _Inotify(INBOX_PATH, IN_CLOSE_WRITE | IN_MOVED_TO)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable ({e}), falling back to Watchdog")
+
+    def drain_inotify():
+        for name in inotify.read_names():
+            on_file(os.path.join(INBOX_PATH, name))
+
+    if inotify:
+        # The kernel wakes the loop directly; no watcher thread involved
+        loop.add_reader(inotify.fd, drain_inotify)
+        logger.info(f"Started SMS inotify watch on {INBOX_PATH}")
+    else:
+        observer = Observer()
+        observer.schedule(_WatchdogHandler(loop, on_file), INBOX_PATH, recursive=False)
+        observer.start()
+        logger.info(f"Started SMS Watchdog on {INBOX_PATH}")
 
     try:
         while True:
@@ -122,37 +234,78 @@ async def monitor_inbox() -> AsyncGenerator[Tuple[str, str], None]:
             yield phone, text
             queue.task_done()
     finally:
-        observer.stop()
-        observer.join()
-        logger.info("Stopped SMS Watchdog")
+        if inotify:
+            loop.remove_reader(inotify.fd)
+            inotify.close()
+        else:
+            observer.stop()
+            observer.join()
+        logger.info("Stopped SMS inbox watch")
+
+def _scan_inbox(limit: int) -> list[tuple]:
+    """
+    Blocking helper: read the parts of the `limit` newest messages.
+    Gammu names are timestamp-prefixed, so sorting names newest-first lets us
+    stop reading as soon as `limit` distinct messages have been collected.
+    Returns flat (date, time, phone, serial, seq, text) rows, one per part.
+    """
+    inbox = os.fsencode(INBOX_PATH)
+    # bytes path -> bytes names, so non-matching files are rejected without decoding
+    with os.scandir(inbox) as it:
+        names = sorted((e.name for e in it), reverse=True)
+    
+    rows = []
+    seen = set()
+    for filename in names:
+        meta = parse_filename(filename)
+        if not meta: continue
+        
+        key = (meta['date'], meta['time'], meta['phone'], meta['serial'])
+        if key not in seen:
+            if len(seen) >= limit: break
+            seen.add(key)
+        try:
+            with open(os.path.join(inbox, filename), "rb") as f:
+                rows.append((*key, meta['seq'], f.read().decode("utf-8", "ignore")))
+        except OSError: continue
+    return rows
+
+# (inbox dir mtime_ns, limit, messages) of the last scan. The watcher lives in
+# another process, so the directory mtime (bumped on every add/remove) is the invalidation signal.
+_inbox_cache: Optional[tuple] = None
+# Don't cache a scan while the directory changed this recently: Gammu creates a file before
+# writing it, and a file created in the same mtime tick as the scan wouldn't bump it again.
+INBOX_SETTLE_NS = 2_000_000_000
 
 async def get_inbox_messages(limit: int = 5) -> list[dict]:
     """Public API: Read recent SMS from inbox directory."""
-    if not os.path.exists(INBOX_PATH): return []
+    global _inbox_cache
+    limit = int(limit)
+    try:
+        dir_mtime = os.stat(INBOX_PATH).st_mtime_ns
+    except OSError:
+        return []
+    if _inbox_cache and _inbox_cache[0] == dir_mtime and _inbox_cache[1] >= limit:
+        return _inbox_cache[2][:limit]
     
-    messages_map = {}
     try:
-        for filename in os.listdir(INBOX_PATH):
-            meta = parse_filename(filename)
-            if not meta: continue
-            
-            filepath = os.path.join(INBOX_PATH, filename)
-            try:
-                async with aiofiles.open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-                     content = await f.read()
-                
-                key = (meta['date'], meta['time'], meta['phone'], meta['serial'])
-                if key not in messages_map: messages_map[key] = {}
-                messages_map[key][meta['seq']] = content
-            except: continue
-            
+        # One thread hop for the whole scan instead of one per file
+        rows = await asyncio.to_thread(_scan_inbox, limit)
+        
+        # One sort puts every message's parts together and in seq order
+        rows.sort(key=itemgetter(0, 1, 2, 3, 4))
         final_msgs = []
-        for (d, t, p, s), parts in messages_map.items():
-            text = "".join([v for k,v in sorted(parts.items())])
+        for (d, t, p, _), parts in groupby(rows, key=itemgetter(0, 1, 2, 3)):
+            text = "".join(r[5] for r in parts)
             ts = f"{d[:4]}-{d[4:6]}-{d[6:]} {t[:2]}:{t[2:4]}:{t[4:]}"
-            final_msgs.append({"ts": ts, "sender": p, "text": text})
+            # Short "MM-DD HH:MM" label for list UIs, sliced once here
+            date_hm = f"{d[4:6]}-{d[6:]} {t[:2]}:{t[2:4]}"
+            final_msgs.append({"ts": ts, "date_hm": date_hm, "sender": p, "text": text})
             
-        return sorted(final_msgs, key=lambda x: x["ts"], reverse=True)[:limit]
+        final_msgs.reverse() # Newest first
+        if time.time_ns() - dir_mtime >= INBOX_SETTLE_NS:
+            _inbox_cache = (dir_mtime, limit, final_msgs)
+        return final_msgs[:]
     except Exception as e:
         logger.error(f"Error scanning inbox: {e}")
         return []
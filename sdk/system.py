@@ -1,22 +1,114 @@
-import aiofiles
+import asyncio
+import mmap
+import os
+import time
+from datetime import datetime
+from typing import Optional
 from loguru import logger
 
+try:
+    # python3-systemd: reads the journal in-process instead of forking journalctl
+    from systemd import journal
+except ImportError:
+    journal = None
+
+PICO_UNITS = ("pico-bot.service", "pico-sms.service", "pico-scheduler.service", "pico-music.service")
+# Bytes of subprocess output kept; plenty for a Telegram-sized tail
+TAIL_BYTES = 16384
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+TEMP_CACHE_TTL = 5.0
+
+# (monotonic timestamp, value) of the last successful read (-inf: never, so the first call always reads sysfs)
+_last_temp = (float("-inf"), 0.0)
+
 async def get_cpu_temperature() -> float:
     """
     Get the current CPU temperature from the thermal zone file.
     Returns 0.0 if reading fails.
     """
+    global _last_temp
+    now = time.monotonic()
+    if now - _last_temp[0] < TEMP_CACHE_TTL:
+        return _last_temp[1]
+
     try:
-        # logger.info("Reading CPU Temperature from kernel...") 
-        # Commented out verbose log to reduce noise if queried frequently, 
-        # or keep it debug level if logic allows. 
-        # Keeping it info for now as per previous behavior, or maybe reduce noise? 
-        # User wants "Hacker Mode", maybe less noise? 
-        # But previous code had it. I'll keep it simple.
-        async with aiofiles.open("/sys/class/thermal/thermal_zone0/temp", "r") as f:
-            content = await f.read()
-            temp = float(content) / 1000.0
-            return temp
+        # sysfs reads don't block, so skip the aiofiles threadpool round-trip
+        with open(THERMAL_ZONE, "rb") as f:
+            temp = int(f.read()) / 1000.0
+        _last_temp = (now, temp)
+        return temp
     except Exception as e:
         logger.error(f"Failed to read CPU temperature: {e}")
         return 0.0
+
+def _read_journal(units: tuple, n: int, since: Optional[float]) -> str:
+    reader = journal.Reader()
+    try:
+        reader.this_boot()
+        # Matches on the same field are OR'ed by sd-journal
+        for unit in units:
+            reader.add_match(_SYSTEMD_UNIT=unit)
+        reader.seek_tail()
+        # Entry timestamps are naive local datetimes, like fromtimestamp()
+        cutoff = datetime.fromtimestamp(time.time() - since) if since else None
+        entries = []
+        for _ in range(n):
+            entry = reader.get_previous()
+            if not entry:
+                break
+            if cutoff and entry.get("__REALTIME_TIMESTAMP", cutoff) < cutoff:
+                break
+            entries.append(entry)
+    finally:
+        reader.close()
+
+    lines = []
+    for entry in reversed(entries):
+        ts = entry.get("__REALTIME_TIMESTAMP")
+        ts_str = ts.strftime("%b %d %H:%M:%S") if ts else "?"
+        ident = entry.get("SYSLOG_IDENTIFIER", "?")
+        lines.append(f"{ts_str} {ident}: {entry.get('MESSAGE', '')}")
+    return "\n".join(lines)
+
+async def tail_journal(n: int = 20, units: tuple = (), since: Optional[float] = None) -> Optional[str]:
+    """
+    Get the last N journal messages, optionally limited to `units` and to the last `since` seconds.
+    Returns None if the systemd bindings are not installed (caller should fall back to journalctl).
+    """
+    if journal is None:
+        return None
+    return await asyncio.to_thread(_read_journal, units, n, since)
+
+def _tail_lines(path: str, n: int) -> bytes:
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Walk back over n newlines (ignoring a trailing one); only those pages get touched
+            end = size - 1 if mm[size - 1:size] == b"\n" else size
+            pos = end
+            for _ in range(n):
+                pos = mm.rfind(b"\n", 0, pos)
+                if pos < 0:
+                    break
+            return mm[pos + 1:end]
+
+async def tail_file(path: str, n: int = 30) -> str:
+    """Get the last N lines of a text file without reading the rest of it."""
+    data = await asyncio.to_thread(_tail_lines, path, n)
+    return data.decode(errors="replace")
+
+async def run_tail_output(*argv: str, max_bytes: int = TAIL_BYTES) -> str:
+    """Run a command and return only the last `max_bytes` of its stdout, without buffering the rest."""
+    proc = await asyncio.create_subprocess_exec(
+        *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    buf = bytearray()
+    while chunk := await proc.stdout.read(65536):
+        buf += chunk
+        if len(buf) > max_bytes:
+            del buf[:-max_bytes]
+    await proc.wait()
+    # The cut may split a UTF-8 sequence; drop the fragment rather than emit U+FFFD
+    return buf.decode(errors="ignore")
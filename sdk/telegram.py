@@ -1,4 +1,6 @@
-from aiogram import Bot, Dispatcher
+import asyncio
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from cachetools import TTLCache
 from loguru import logger
 import sdk.config as config
 
@@ -11,8 +13,62 @@ if not config.TELEGRAM_BOT_TOKEN:
 else:
     bot = Bot(token=config.TELEGRAM_BOT_TOKEN)
 
+# Telegram flood limits: ~30 messages/s bot-wide, ~1 message/s per chat
+GLOBAL_RATE = 30
+CHAT_INTERVAL = 1.0
+
+class RateLimitMiddleware(BaseMiddleware):
+    """Delay handlers so their replies stay under Telegram's flood limits."""
+
+    def __init__(self, rate: float = GLOBAL_RATE, chat_interval: float = CHAT_INTERVAL):
+        self.interval = 1 / rate
+        self.chat_interval = chat_interval
+        self._next_slot = 0.0
+        # chat_id -> loop time of its next free slot; idle chats age out
+        self._next_chat_slot = TTLCache(maxsize=1024, ttl=60)
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user and not is_user_allowed(user.id):
+            # Handlers drop these anyway; don't let outsiders push back the owner's slots
+            return await handler(event, data)
+        now = asyncio.get_running_loop().time()
+        # Reserve slots synchronously so concurrent updates queue up behind each other
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        chat = data.get("event_chat")
+        if chat:
+            slot = max(slot, self._next_chat_slot.get(chat.id, 0.0))
+            self._next_chat_slot[chat.id] = slot + self.chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        return await handler(event, data)
+
+# Window in which a repeat tap of the same button is treated as a double-tap.
+# Kept short so deliberate re-presses (e.g. reopening an SMS after "Back") still work.
+DEDUPE_TTL = 3
+
+class CallbackDedupeMiddleware(BaseMiddleware):
+    """Swallow repeated presses of the same inline button within DEDUPE_TTL seconds."""
+
+    def __init__(self, ttl: float = DEDUPE_TTL):
+        self._recent = TTLCache(maxsize=2048, ttl=ttl)
+
+    async def __call__(self, handler, event, data):
+        if event.message:
+            key = (event.message.chat.id, event.message.message_id, event.data)
+            if key in self._recent:
+                await event.answer("⏳")
+                return None
+            self._recent[key] = True
+        return await handler(event, data)
+
 
 dp = Dispatcher()
+dp.callback_query.outer_middleware(CallbackDedupeMiddleware())
+_rate_limiter = RateLimitMiddleware()
+dp.message.middleware(_rate_limiter)
+dp.callback_query.middleware(_rate_limiter)
 
 def is_user_allowed(user_id: int) -> bool:
     """Check if the user is authorized based on config."""
@@ -4,7 +4,20 @@ import json
 import aiofiles
 import sdk.config as config
 from loguru import logger
-from sdk.system import get_cpu_temperature
+from sdk.system import get_cpu_temperature, run_tail_output, tail_journal, PICO_UNITS
+
+# Strong refs so fire-and-forget tasks aren't garbage-collected mid-flight
+_background_tasks = set()
+
+async def _delayed_exec(delay: float, *argv: str):
+    """Wait `delay` seconds, then spawn `argv` directly (no shell)."""
+    await asyncio.sleep(delay)
+    await asyncio.create_subprocess_exec(*argv)
+
+def _schedule(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
 async def get_system_temperature_tool():
     """
@@ -20,7 +33,7 @@ async def get_system_temperature_tool():
 
 async def get_system_logs_tool(lines: int = 20):
     """
-    Get the last N lines of the system logs (pico service).
+    Get the last N lines of the system logs (pico services, last hour only).
     
     Args:
         lines (int): Number of lines to retrieve (default 20, max 100).
@@ -31,13 +44,15 @@ async def get_system_logs_tool(lines: int = 20):
     logger.info(f"TOOL EXECUTION: get_system_logs_tool({lines}) started")
     lines = min(lines, 100)
     try:
-        proc = await asyncio.create_subprocess_shell(
-            f"journalctl -u pico* -n {lines} --no-pager", # Match pico-bot, pico-sms etc
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await proc.communicate()
-        logs = stdout.decode().strip()
+        logs = await tail_journal(lines, PICO_UNITS, since=3600)
+        if logs is None:
+            unit_args = [arg for unit in PICO_UNITS for arg in ("-u", unit)]
+            # Explicit units and --since keep journalctl from walking the whole journal
+            logs = await run_tail_output(
+                "journalctl", *unit_args, "-n", str(lines), "--since", "-1h",
+                "--no-pager", "--output=short",
+            )
+        logs = logs.strip()
         logger.info(f"TOOL EXECUTION: get_system_logs_tool() result length: {len(logs)}")
         return logs or "No logs found."
     except Exception as e:
@@ -51,9 +66,8 @@ async def restart_pico_tool():
         str: Status message.
     """
     logger.info("TOOL EXECUTION: restart_pico_tool() started")
-    # Trigger restart in background
-    asyncio.create_task(asyncio.sleep(2))
-    asyncio.create_task(asyncio.create_subprocess_shell("sudo systemctl restart pico-bot pico-sms pico-scheduler"))
+    # Trigger restart in background, after the reply had time to go out
+    _schedule(_delayed_exec(2, "sudo", "systemctl", "restart", "pico-bot", "pico-sms", "pico-scheduler"))
     return "Restarting Pico services in 2 seconds..."
 
 async def restart_system_tool():
@@ -64,13 +78,12 @@ async def restart_system_tool():
         str: Status message.
     """
     logger.info("TOOL EXECUTION: restart_system_tool() started")
-    asyncio.create_task(asyncio.sleep(2))
-    asyncio.create_task(asyncio.create_subprocess_shell("sudo reboot"))
+    _schedule(_delayed_exec(2, "sudo", "reboot"))
     return "Rebooting system in 2 seconds..."
 
 async def get_sys_logs_tool(lines: int = 20):
     """
-    Get the last N lines of the general system logs (journalctl).
+    Get the last N lines of the general system logs (journalctl, last 10 minutes only).
     
     Args:
         lines (int): Number of lines to retrieve (default 20, max 100).
@@ -81,13 +94,10 @@ async def get_sys_logs_tool(lines: int = 20):
     logger.info(f"TOOL EXECUTION: get_sys_logs_tool({lines}) started")
     lines = min(lines, 100)
     try:
-        proc = await asyncio.create_subprocess_shell(
-            f"journalctl -n {lines} --no-pager",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await proc.communicate()
-        logs = stdout.decode().strip()
+        logs = await tail_journal(lines, since=600)
+        if logs is None:
+            logs = await run_tail_output("journalctl", "-n", str(lines), "--since", "-10min", "--no-pager")
+        logs = logs.strip()
         logger.info(f"TOOL EXECUTION: get_sys_logs_tool() result length: {len(logs)}")
         return logs or "No logs found."
     except Exception as e:
@@ -108,11 +118,14 @@ async def read_inbox_tool(limit: int = 5):
     logger.info(f"TOOL EXECUTION: read_inbox_tool({limit}) started")
     
     msgs = await get_inbox_messages(limit)
+    return format_inbox_result(msgs)
+
+def format_inbox_result(msgs: list[dict]) -> str:
+    """Render inbox messages as the tool result the agent sees (UI-only fields dropped)."""
     if not msgs:
         return "Inbox is empty or directory not found."
-    
     # Return as JSON for the agent
-    return json.dumps(msgs)
+    return json.dumps([{"ts": m["ts"], "sender": m["sender"], "text": m["text"]} for m in msgs])
 
 async def check_uscis_tool():
     """
@@ -125,13 +138,16 @@ async def check_uscis_tool():
     logger.info("TOOL EXECUTION: check_uscis_tool() started")
     return await get_formatted_report()
 
+# Built once; the tool set never changes at runtime
+_TOOLS = (
+    get_system_temperature_tool,
+    get_system_logs_tool,
+    get_sys_logs_tool,
+    read_inbox_tool,
+    check_uscis_tool,
+    restart_pico_tool,
+    restart_system_tool
+)
+
 def get_tools():
-    return [
-        get_system_temperature_tool,
-        get_system_logs_tool,
-        get_sys_logs_tool,
-        read_inbox_tool,
-        check_uscis_tool,
-        restart_pico_tool,
-        restart_system_tool
-    ]
+    return _TOOLS
@@ -1,10 +1,32 @@
 import asyncio
+import os
 import pyotp
 import json
+import tempfile
+from typing import Optional
 from loguru import logger
 from playwright.async_api import async_playwright
 from playwright_stealth import Stealth
 from sdk import config
+import sdk.http
+
+# Cookies + localStorage of the last good login (Playwright storage_state)
+SESSION_FILE = "data/uscis_session.json"
+USCIS_ORIGIN = "https://my.uscis.gov"
+CASE_API_URL = USCIS_ORIGIN + "/account/case-service/api/cases/{}"
+# Runs inside the page so the request carries the browser's own session
+FETCH_TEXT_JS = "async u => (await fetch(u, {credentials: 'include', headers: {'Accept': 'application/json'}})).text()"
+# Max case pages fetched in parallel
+CASE_CONCURRENCY = 4
+# Never rendered, so not worth downloading (stylesheets stay for the login form layout)
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media"})
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36"
+
+async def _block_assets(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
 
 class UscisClient:
     def __init__(self):
@@ -13,26 +35,49 @@ class UscisClient:
         self.context = None
         self.page = None
         self.is_logged_in = False
+        self._cookie_header = None
+        # Cookies of the saved session when the last login() passed the HTTP probe, else None
+        self._probed_cookies = None
+        self._login_lock = asyncio.Lock()
+        # Case tasks in check_all may all fall back to the browser at once
+        self._browser_lock = asyncio.Lock()
 
     async def _init_browser(self):
-        if self.playwright:
+        if self.page:
             return
-        self.playwright = await async_playwright().start()
-        
-        # Use a persistent context to cache login info
-        import os
-        user_data_dir = os.path.abspath("data/uscis_browser")
-        os.makedirs(user_data_dir, exist_ok=True)
-        
-        logger.info(f"Launching persistent browser context from {user_data_dir}")
-        self.context = await self.playwright.chromium.launch_persistent_context(
-            user_data_dir=user_data_dir,
-            headless=True,
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 800}
-        )
-        self.page = self.context.pages[0] if self.context.pages else await self.context.new_page()
-        await Stealth().apply_stealth_async(self.page)
+        async with self._browser_lock:
+            # Another task may have launched it while we waited
+            if self.page:
+                return
+            playwright = await async_playwright().start()
+            try:
+                browser = await playwright.chromium.launch(headless=True)
+                
+                # Ephemeral context seeded from the saved session instead of a full user profile
+                os.makedirs(os.path.dirname(SESSION_FILE), exist_ok=True)
+                storage_state = SESSION_FILE if os.path.exists(SESSION_FILE) else None
+                logger.info(f"Launching browser context (saved session: {bool(storage_state)})")
+                context = await browser.new_context(
+                    storage_state=storage_state,
+                    user_agent=USER_AGENT,
+                    viewport={"width": 1280, "height": 800}
+                )
+                await Stealth().apply_stealth_async(context)
+                await context.route("**/*", _block_assets)
+                page = await context.new_page()
+            except BaseException:
+                # Half-initialized: tear down (stopping the driver kills its browser) so the next call retries
+                await playwright.stop()
+                raise
+            # Publish only a fully working browser; the long-lived client must never see a partial one
+            self.playwright, self.browser, self.context, self.page = playwright, browser, context, page
+
+    async def _save_session(self):
+        """Persist cookies/localStorage so the next run can skip the login flow."""
+        try:
+            await self.context.storage_state(path=SESSION_FILE)
+        except Exception as e:
+            logger.warning(f"Failed to save USCIS session: {e}")
 
     def get_otp(self):
         """Generate OTP code from secret or URI."""
@@ -46,8 +91,41 @@ class UscisClient:
             totp = pyotp.TOTP(secret)
         return totp.now()
 
+    async def _probe_cookies(self) -> bool:
+        """
+        Check the saved session with a single HTTP GET, without starting Chromium.
+        On success the saved cookies are kept for the case API calls.
+        """
+        if not os.path.exists(SESSION_FILE):
+            return False
+        try:
+            state = await asyncio.to_thread(load_state, SESSION_FILE)
+            cookies = [c for c in state.get("cookies", []) if "uscis.gov" in c.get("domain", "")]
+            cookie_header = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+            if not cookie_header:
+                return False
+            resp = await sdk.http.get().get(
+                CASE_API_URL.format("probe"),
+                headers={"User-Agent": USER_AGENT, "Accept": "application/json", "Cookie": cookie_header},
+                timeout=5.0
+            )
+            if resp.status_code != 200:
+                return False
+            data = resp.json()
+            # Same rule as is_session_active: an error without data means expired
+            if data.get("error") is not None and data.get("data") is None:
+                return False
+            self._cookie_header = cookie_header
+            self._probed_cookies = cookies
+            return True
+        except Exception as e:
+            logger.debug(f"Cookie probe failed: {e}")
+            return False
+
     async def is_session_active(self):
         """Check if we are already logged in via a fast API probe."""
+        if not os.path.exists(SESSION_FILE):
+            return False
         try:
             # Try a very fast probe to a real API endpoint
             await self.page.goto("https://my.uscis.gov/account/case-service/api/cases/probe", wait_until="commit", timeout=10000)
@@ -70,7 +148,20 @@ class UscisClient:
             return False
 
     async def login(self):
+        """Validate the session, logging in again if needed. Concurrent callers share one attempt."""
+        async with self._login_lock:
+            self.is_logged_in = await self._login()
+            return self.is_logged_in
+
+    async def _login(self):
         """Complete 2nd-step login process via browser automation."""
+        self._probed_cookies = None
+        # Happy path: the saved session still works, no browser needed
+        if await self._probe_cookies():
+            logger.info("Saved USCIS session is still valid")
+            self.is_logged_in = True
+            return True
+
         await self._init_browser()
         
         if await self.is_session_active():
@@ -93,6 +184,7 @@ class UscisClient:
                 if "/applicant" in self.page.url:
                     logger.info("Already at applicant page.")
                     self.is_logged_in = True
+                    await self._save_session()
                     return True
 
             # Wait for email field (which handles the redirect automatically)
@@ -104,9 +196,14 @@ class UscisClient:
                 await asyncio.sleep(10)
                 await self.page.screenshot(path="logs/uscis_waf.png")
 
+            # Resolve the form fields once and reuse the locators below
+            email_input = self.page.locator('input[id*="email"], input[name*="email"]').first
+            password_input = self.page.locator('input[id*="password"], input[name*="password"]').first
+            code_input = self.page.locator('input[id*="code"], input[name*="code"]').first
+
             # Wait for email field
             try:
-                await self.page.wait_for_selector('input[id*="email"], input[name*="email"]', timeout=15000)
+                await email_input.wait_for(timeout=15000)
             except:
                 logger.error("Email field not found. Logging available selectors.")
                 inputs = await self.page.query_selector_all('input')
@@ -118,23 +215,21 @@ class UscisClient:
                 return False
 
             # Fill email and password using ID or name
-            await self.page.fill('input[id*="email"], input[name*="email"]', config.USCIS_EMAIL)
-            await self.page.fill('input[id*="password"], input[name*="password"]', config.USCIS_PASSWORD)
+            await email_input.fill(config.USCIS_EMAIL)
+            await password_input.fill(config.USCIS_PASSWORD)
             
             # Submit credentials via Enter key on password field
             logger.info("Submitting credentials via Enter key...")
-            await asyncio.sleep(2) 
-            await self.page.focus('input[id*="password"], input[name*="password"]')
+            await password_input.focus()
             await self.page.screenshot(path="logs/uscis_before_enter.png")
-            await self.page.press('input[id*="password"], input[name*="password"]', "Enter")
+            await password_input.press("Enter")
             
             await self.page.wait_for_load_state("domcontentloaded")
-            await asyncio.sleep(5) # Wait a bit for potential redirect
             await self.page.screenshot(path="logs/uscis_after_enter.png")
 
-            # Check if we are on the verification page
+            # Check if we are on the verification page (returns as soon as the field shows up)
             try:
-                await self.page.wait_for_selector('input[id*="code"], input[name*="code"]', timeout=30000)
+                await code_input.wait_for(state="visible", timeout=30000)
             except:
                 logger.error(f"Failed to reach verification page. URL: {self.page.url}")
                 await self.page.screenshot(path="logs/uscis_otp_missing.png")
@@ -143,7 +238,7 @@ class UscisClient:
             # Step 2: Verification Code
             otp = self.get_otp()
             logger.info(f"Generated OTP: {otp}. Entering code...")
-            await self.page.fill('input[id*="code"], input[name*="code"]', otp)
+            await code_input.fill(otp)
             
             # Submit OTP
             logger.info("Submitting OTP...")
@@ -153,9 +248,12 @@ class UscisClient:
             try:
                 await self.page.wait_for_url(lambda url: "/dashboard" in url or "/applicant" in url, timeout=40000)
                 logger.info(f"Target reached: {self.page.url}")
-                # Wait for dashboard to load completely as suggested by user
-                logger.info("Waiting 5s for dashboard info to load...")
-                await asyncio.sleep(5)
+                # Wait for dashboard to load completely, but no longer than needed
+                logger.info("Waiting for dashboard info to load...")
+                try:
+                    await self.page.wait_for_load_state("networkidle", timeout=15000)
+                except Exception:
+                    logger.debug("Dashboard did not reach networkidle, continuing")
                 await self.page.screenshot(path="logs/uscis_dashboard.png")
             except Exception as e:
                 logger.warning(f"wait_for_url timed out, but continuing... current: {self.page.url}")
@@ -163,6 +261,7 @@ class UscisClient:
 
             logger.info("USCIS Browser Login Successful")
             self.is_logged_in = True
+            await self._save_session()
             return True
 
         except Exception as e:
@@ -174,7 +273,7 @@ class UscisClient:
         """Navigate to applicant page and wait for session to stabilize."""
         bridge_url = "https://my.uscis.gov/account/applicant"
         logger.info("Bridging session: Navigating to applicant page and waiting...")
-        await self.page.goto(bridge_url, wait_until="domcontentloaded", timeout=40000)
+        await self.page.goto(bridge_url, wait_until="commit", timeout=40000)
         await asyncio.sleep(8) # Wait for background session sync
         await self.page.screenshot(path="logs/uscis_bridged.png")
 
@@ -184,15 +283,24 @@ class UscisClient:
             if not await self.login():
                 return {"error": "Authentication failed"}
 
+        await self._init_browser()
+        return await self._fetch_case(self.page, case_number)
+
+    async def _fetch_case(self, page, case_number):
+        """Fetch the case API URL from inside `page` and parse the JSON body."""
         try:
-            url = f"https://my.uscis.gov/account/case-service/api/cases/{case_number}"
-            logger.info(f"Directly navigating to API: {url}")
-            
-            # Simple direct navigation. Browser handles cookies/session automatically.
-            await self.page.goto(url, wait_until="domcontentloaded", timeout=30000)
-            
-            # Retrieve the full body text (the JSON)
-            content = await self.page.inner_text("body")
+            url = CASE_API_URL.format(case_number)
+            if page.url.startswith(USCIS_ORIGIN):
+                # Same-origin XHR from the current page: no navigation or DOM build
+                logger.info(f"Fetching API in page: {url}")
+                content = await page.evaluate(FETCH_TEXT_JS, url)
+            else:
+                logger.info(f"Directly navigating to API: {url}")
+                
+                # Simple direct navigation. Browser handles cookies/session automatically.
+                # Read the JSON straight off the response once headers arrive; no need to parse a DOM.
+                response = await page.goto(url, wait_until="commit", timeout=30000)
+                content = await response.text() if response else await page.inner_text("body")
             
             try:
                 result_json = json.loads(content)
@@ -206,26 +314,89 @@ class UscisClient:
             logger.error(f"Failed to fetch status for {case_number}: {e}")
             return {"error": str(e)}
 
+    async def _refresh_cookies(self):
+        """Snapshot the browser's USCIS cookies for plain HTTP API calls."""
+        cookies = await self.context.cookies("https://my.uscis.gov")
+        self._cookie_header = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+
+    async def _api_get(self, case_number):
+        """
+        Fetch case JSON with a plain HTTP GET using the browser's cookies.
+        Returns None when the request fails or the API rejects the session
+        (401/403/redirect), so the caller can fall back to browser navigation.
+        """
+        try:
+            resp = await sdk.http.get().get(
+                CASE_API_URL.format(case_number),
+                headers={"User-Agent": USER_AGENT, "Accept": "application/json", "Cookie": self._cookie_header},
+                timeout=30.0
+            )
+        except Exception as e:
+            logger.warning(f"API GET for {case_number} failed ({e}), falling back to browser")
+            return None
+        if resp.status_code in (401, 403) or resp.is_redirect:
+            logger.warning(f"API GET for {case_number} rejected ({resp.status_code}), falling back to browser")
+            return None
+        try:
+            result_json = resp.json()
+            logger.debug(f"Captured JSON for {case_number}: {result_json}")
+            return result_json
+        except ValueError:
+            logger.error(f"Failed to parse JSON for {case_number}. Content starts with: {resp.text[:100]}")
+            return {"error": "Invalid JSON response", "content": resp.text[:500]}
+
     async def check_all(self, case_list: list = None):
-        """Check specified cases (or all configured ones) with fail-fast logic."""
-        if not self.is_logged_in:
-            if not await self.login():
-                 return {}
+        """Check specified cases (or all configured ones) concurrently."""
+        # Re-validate on every run: a long-lived client can outlive its session
+        if not await self.login():
+             return {}
 
         target_cases = case_list or config.USCIS_CASE_NUMBERS
+        sem = asyncio.Semaphore(CASE_CONCURRENCY)
+        if self._probed_cookies is not None:
+            # The probe validated the saved session, which the other service may have renewed
+            # since this browser last logged in: keep its cookies and move the browser onto them
+            if self.context:
+                await self.context.add_cookies(self._probed_cookies)
+        else:
+            await self._refresh_cookies()
+
+        async def _check_one(cn):
+            async with sem:
+                logger.info(f"Checking USCIS Case: {cn}")
+                status = await self._api_get(cn)
+                if status is not None:
+                    return status
+
+                # Browser fallback: fetch from the main page if it is already on
+                # the USCIS origin, otherwise from a new tab (tabs share cookies)
+                await self._init_browser()
+                if self.page.url.startswith(USCIS_ORIGIN):
+                    status = await self._fetch_case(self.page, cn)
+                else:
+                    page = await self.context.new_page()
+                    try:
+                        status = await self._fetch_case(page, cn)
+                    finally:
+                        await page.close()
+                # Only a fallback that got real case data proves the browser session is good;
+                # saving a failed one could overwrite a session the other service just renewed
+                if isinstance(status, dict) and status.get("data") is not None:
+                    await self._refresh_cookies()
+                    await self._save_session()
+                return status
+
+        statuses = await asyncio.gather(*(_check_one(cn) for cn in target_cases), return_exceptions=True)
+
         results = {}
-        for idx, cn in enumerate(target_cases):
-            logger.info(f"Checking USCIS Case: {cn}")
-            status = await self.get_case_status(cn)
+        for cn, status in zip(target_cases, statuses):
+            if isinstance(status, BaseException):
+                status = {"error": str(status)}
             results[cn] = status
             
-            # Log error but continue to next case
+            # Log error but keep the other cases
             if isinstance(status, dict) and status.get("error") is not None:
                 logger.error(f"Error fetching {cn}: {status['error']}")
-                
-            # Only sleep if there are more cases to check
-            if idx < len(target_cases) - 1:
-                await asyncio.sleep(2) 
         return results
 
     async def close(self):
@@ -233,6 +404,54 @@ class UscisClient:
             await self.browser.close()
         if self.playwright:
             await self.playwright.stop()
+        self.playwright = self.browser = self.context = self.page = None
+        self.is_logged_in = False
+
+# Long-lived client shared by reports and tool calls in this process
+_client: Optional[UscisClient] = None
+_client_lock = asyncio.Lock()
+
+async def get_client() -> UscisClient:
+    """Return the process-wide UscisClient, creating it on first use."""
+    global _client
+    async with _client_lock:
+        if _client is None:
+            _client = UscisClient()
+        return _client
+
+async def close_client():
+    """Close the process-wide UscisClient. Call once on service shutdown."""
+    global _client
+    async with _client_lock:
+        if _client is not None:
+            await _client.close()
+            _client = None
+
+def load_state(path: str) -> dict:
+    """Blocking helper: read a JSON state file ({} if missing)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_state(path: str, state: dict):
+    """Blocking helper: write a JSON state file atomically (unique tmp file + fsync + rename)."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Unique name: the bot and the scheduler may save the same file concurrently
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
 
 async def get_formatted_report(case_list: list = None, show_diff: bool = True) -> str:
     """
@@ -241,26 +460,21 @@ async def get_formatted_report(case_list: list = None, show_diff: bool = True) -
         case_list: List of case numbers to check. Defaults to all configured in config.
         show_diff: Whether to load previous state and show differences.
     """
-    import os
-    from sdk.uscis import UscisClient
-    
     state_file = "data/uscis_state.json"
-    client = UscisClient()
+    client = await get_client()
     try:
         # Fetch status for the requested list
         results = await client.check_all(case_list=case_list)
 
         # Always try to load existing state (both for diffing and merging)
         old_statuses = {}
-        if os.path.exists(state_file):
-            try:
-                with open(state_file, 'r') as f:
-                    old_statuses = json.load(f)
-            except Exception as e:
-                logger.warning(f"Failed to load state file: {e}")
+        try:
+            old_statuses = await asyncio.to_thread(load_state, state_file)
+        except Exception as e:
+            logger.warning(f"Failed to load state file: {e}")
 
         is_multiple = len(results) > 1
-        report = "📋 <b>USCIS Case Status Report</b>\n\n" if is_multiple else ""
+        parts: list[str] = ["📋 <b>USCIS Case Status Report</b>\n\n"] if is_multiple else []
         
         # We will merge new results into the global state
         new_state = old_statuses.copy()
@@ -276,7 +490,7 @@ async def get_formatted_report(case_list: list = None, show_diff: bool = True) -
                 else:
                     error_msg = str(error_obj)
 
-                report += f"❌ <code>{cn}</code>: {error_msg}\n"
+                parts.append(f"❌ <code>{cn}</code>: {error_msg}\n")
                 continue
 
             # Update merged state only on success
@@ -285,7 +499,7 @@ async def get_formatted_report(case_list: list = None, show_diff: bool = True) -
             # Extract data
             data = status.get("data")
             if not data:
-                report += f"⚠️ <code>{cn}</code>: No data returned\n"
+                parts.append(f"⚠️ <code>{cn}</code>: No data returned\n")
                 continue
                 
             form_type = data.get("formType", "N/A")
@@ -298,17 +512,17 @@ async def get_formatted_report(case_list: list = None, show_diff: bool = True) -
             event_str = ", ".join(event_codes) if event_codes else "None"
             
             if is_multiple:
-                report += f"🔹 <tg-spoiler>{cn}</tg-spoiler> ({form_type})\n   {form_name}\n"
+                parts.append(f"🔹 <tg-spoiler>{cn}</tg-spoiler> ({form_type})\n   {form_name}\n")
             else:
-                report += (
+                parts.append(
                     f"🇺🇸 <b>USCIS Case Status</b>\n\n"
                     f"<b>Case #:</b> <tg-spoiler>{cn}</tg-spoiler>\n"
                     f"<b>Form:</b> {form_type}\n"
                     f"<b>Type:</b> {form_name}\n"
                 )
 
-            report += f"   📋 Events: <code>{event_str}</code>\n"
-            report += f"   Last updated: <code>{updated_at}</code>\n"
+            parts.append(f"   📋 Events: <code>{event_str}</code>\n")
+            parts.append(f"   Last updated: <code>{updated_at}</code>\n")
             
             # Diff logic
             if show_diff:
@@ -328,26 +542,22 @@ async def get_formatted_report(case_list: list = None, show_diff: bool = True) -
                         if ne > oe: changes.append(f"📋 New events: +{ne-oe}")
                     
                     if changes:
-                        report += f"   📊 <b>Changes:</b>\n   " + "\n   ".join(changes) + "\n"
+                        parts.append("   📊 <b>Changes:</b>\n   " + "\n   ".join(changes) + "\n")
                     else:
-                        report += "   ✅ No changes since last check\n"
+                        parts.append("   ✅ No changes since last check\n")
                 else:
-                    report += "   🆕 First time checking this case\n"
+                    parts.append("   🆕 First time checking this case\n")
             
-            report += "\n"
+            parts.append("\n")
         
         # Save the merged state back to disk
         try:
-            os.makedirs(os.path.dirname(state_file), exist_ok=True)
-            with open(state_file, 'w') as f:
-                json.dump(new_state, f, indent=2, ensure_ascii=False)
+            await asyncio.to_thread(save_state, state_file, new_state)
             logger.debug(f"Saved merged USCIS state to {state_file}")
         except Exception as e:
             logger.error(f"Failed to save USCIS state: {e}")
 
-        return report.strip()
+        return "".join(parts).strip()
     except Exception as e:
         logger.error(f"Failed to generate USCIS report: {e}")
         return f"❌ Error generating report: {str(e)}"
-    finally:
-        await client.close()
@@ -1,17 +1,21 @@
 import asyncio
+from cachetools import TTLCache
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import CommandStart
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from aiogram.utils.text_decorations import html_decoration as hd
 import httpx
 import os
-import json
 from loguru import logger
 
 # Project imports
 import sdk.telegram as telegram
 from sdk.telegram import bot, dp
+import sdk.http
 import sdk.llm
+from sdk import memory
 
 # --- Config ---
 # (Environment config imported directly)
@@ -19,15 +23,25 @@ import sdk.llm
 
 agent = None
 
-# Transient store for pending confirmations: {request_id: ToolRequest}
-pending_tools = {}
-# Transient store for SMS lists: {user_id: [msg_dicts]}
-sms_cache = {}
+# aiogram already runs each update as its own task; this caps how many hit the LLM/tools at once
+AGENT_CONCURRENCY = 4
+agent_slots = asyncio.Semaphore(AGENT_CONCURRENCY)
+# Seconds before a stuck LLM call / tool run is abandoned (USCIS tools may drive a browser login)
+CHAT_TIMEOUT = 90
+TOOL_TIMEOUT = 180
+
+# Transient store for pending confirmations: {request_id: ToolRequest} (abandoned ones expire after 10 min)
+pending_tools = TTLCache(maxsize=4096, ttl=600)
+# Transient store for SMS lists: {user_id: [msg_dicts]} (expire after 30 min)
+sms_cache = TTLCache(maxsize=1024, ttl=1800)
 
 # Re-import tools (Need to ensure they use Loguru)
-from sdk.tools import get_tools
+from sdk.tools import get_tools, format_inbox_result
+# Same tuple every call; resolved once for all agent switches
+TOOLS = get_tools()
 from sdk.sms import get_inbox_messages as get_recent_sms_messages # Alias for compatibility or update usage
 from sdk.agents import get_agent, ToolRequest
+from sdk.system import run_tail_output, tail_file, tail_journal
 
 # --- Helper: Ollama Models ---
 
@@ -55,7 +69,6 @@ async def cmd_start(message: types.Message):
 @dp.message(F.text == "/clear")
 async def cmd_clear(message: types.Message):
     """Clear the current session history."""
-    from sdk import memory
     memory.clear_history(message.from_user.id)
     await message.answer("🧹 History cleared.")
 
@@ -67,6 +80,20 @@ async def cmd_temp(message: types.Message):
     temp = await get_cpu_temperature()
     await message.answer(f"🌡️ **System Temperature**\n\nCPU: {temp:.1f}°C")
 
+# (models list, markup) of the last /agent keyboard. sdk.llm returns the same list object
+# while its cache is fresh, so an identity check is enough to reuse the markup.
+_agent_keyboard = (None, None)
+
+def agent_keyboard(models: list) -> InlineKeyboardMarkup:
+    global _agent_keyboard
+    if _agent_keyboard[0] is not models:
+        kb = InlineKeyboardBuilder()
+        for m in models:
+            kb.button(text=m['label'], callback_data=f"set_model:{m['provider']}:{m['model']}")
+        kb.adjust(1)
+        _agent_keyboard = (models, kb.as_markup())
+    return _agent_keyboard[1]
+
 @dp.message(F.text == "/agent")
 async def cmd_agent(message: types.Message):
     """Change the LLM agent/model."""
@@ -78,14 +105,9 @@ async def cmd_agent(message: types.Message):
         await message.answer("Could not fetch models. Check configs.")
         return
 
-    buttons = []
-    for m in models:
-        cb_data = f"set_model:{m['provider']}:{m['model']}"
-        buttons.append([InlineKeyboardButton(text=m['label'], callback_data=cb_data)])
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    keyboard = agent_keyboard(models)
     current_model = agent.model_name if agent else "Default"
-    current_provider = type(agent).__name__.replace("Agent", "") if agent else "Unknown"
+    current_provider = agent.provider_label if agent else "Unknown"
     
     await message.answer(
         f"🛠️ **Agent Settings**\n"
@@ -153,19 +175,24 @@ async def cmd_logs(message: types.Message):
     if not os.path.exists(log_file):
         await message.answer("Log file not found.")
         return
-    proc = await asyncio.create_subprocess_shell(f"tail -n 30 {log_file}", stdout=asyncio.subprocess.PIPE)
-    stdout, _ = await proc.communicate()
-    logs = stdout.decode().strip() or "No logs found."
-    await message.answer(f"📄 **Pico Logs**\n```\n{logs[-4000:]}\n```", parse_mode="Markdown")
+    logs = (await tail_file(log_file, 30)).strip() or "No logs found."
+    await message.answer(f"📄 <b>Pico Logs</b>\n<pre>{hd.quote(logs[-4000:])}</pre>", parse_mode="HTML")
 
 @dp.message(F.text == "/syslogs")
 async def cmd_syslogs(message: types.Message):
     """Show last 30 lines of system logs."""
     if not telegram.is_user_allowed(message.from_user.id): return
-    proc = await asyncio.create_subprocess_shell("journalctl -n 30 --no-pager", stdout=asyncio.subprocess.PIPE)
-    stdout, _ = await proc.communicate()
-    logs = stdout.decode().strip() or "No logs found."
-    await message.answer(f"🖥️ **System Logs**\n```\n{logs[-4000:]}\n```", parse_mode="Markdown")
+    logs = await tail_journal(30)
+    if logs is None:
+        # Only what fits in the reply is kept, so nothing larger is ever decoded
+        try:
+            logs = await run_tail_output("journalctl", "-n", "30", "--no-pager", max_bytes=4000)
+        except OSError as e:
+            # e.g. no journalctl on this host
+            logger.warning(f"journalctl unavailable: {e}")
+            logs = ""
+    logs = logs.strip() or "No logs found."
+    await message.answer(f"🖥️ <b>System Logs</b>\n<pre>{hd.quote(logs[-4000:])}</pre>", parse_mode="HTML")
 
 @dp.callback_query(F.data.startswith("set_model:"))
 async def handle_set_model(callback: CallbackQuery):
@@ -181,7 +208,7 @@ async def handle_set_model(callback: CallbackQuery):
 
     try:
         logger.info(f"Switching to {provider} / {model_name}")
-        agent = get_agent(tools=get_tools(), provider=provider, model_name=model_name)
+        agent = get_agent(tools=TOOLS, provider=provider, model_name=model_name)
         await callback.message.edit_text(
             f"✅ **Agent Updated**\n"
             f"Provider: `{provider.upper()}`\n"
@@ -193,50 +220,54 @@ async def handle_set_model(callback: CallbackQuery):
         logger.error(f"Failed to switch agent: {e}")
         await callback.message.edit_text(f"❌ Failed to switch: {e}")
 
+async def run_tool(req: ToolRequest) -> str:
+    """Execute a confirmed tool request, bounded by agent_slots and TOOL_TIMEOUT."""
+    try:
+        async with agent_slots, asyncio.timeout(TOOL_TIMEOUT):
+            return await agent.execute_tool(req.name, req.args)
+    except TimeoutError:
+        logger.error(f"Tool {req.name} timed out after {TOOL_TIMEOUT}s")
+        return f"Error: {req.name} timed out after {TOOL_TIMEOUT}s."
+
 @dp.callback_query(F.data.startswith("confirm_tool:"))
 async def handle_tool_confirm(callback: CallbackQuery):
     req_id = callback.data.split(":")[1]
     
-    if req_id in pending_tools:
-        req = pending_tools.pop(req_id)
-        
+    req = pending_tools.pop(req_id, None)
+    if req:
         # Special Handling for Interactive SMS Tool
-        if req.name == "read_inbox_tool":
-             await callback.message.edit_text(f"Scanning Inbox ({req.args.get('limit', 5)})...")
+        if req.name == "read_inbox_tool" and agent and agent.supports_direct_tools:
+             try:
+                 limit = int(req.args.get('limit', 5))
+             except (TypeError, ValueError):
+                 await callback.message.edit_text(f"Error: invalid limit {req.args.get('limit')!r}.")
+                 return
+             await callback.message.edit_text(f"Scanning Inbox ({limit})...")
+             
+             # Read in-process: the list feeds the UI directly, JSON is only built for the history
+             try:
+                 msgs = await get_recent_sms_messages(limit)
+             except Exception as e:
+                 logger.error(f"Error reading inbox: {e}")
+                 await callback.message.edit_text(f"Error reading inbox: {e}")
+                 return
+             memory.add_message(callback.from_user.id, "user", f"[Tool Result: {format_inbox_result(msgs)}]")
+             if not msgs:
+                 await callback.message.edit_text("Inbox is empty.")
+                 return
+
+             # Cache messages
+             sms_cache[callback.from_user.id] = msgs
              
-             # Execute tool (it returns JSON string)
-             if hasattr(agent, "execute_tool"):
-                 import sdk.memory as memory
-                 raw_json = await agent.execute_tool(req.name, req.args)
-                 memory.add_message(callback.from_user.id, "user", f"[Tool Result: {raw_json}]")
-                 try:
-                     msgs = json.loads(raw_json)
-                     if isinstance(msgs, dict) and "error" in msgs:
-                         await callback.message.answer(f"Error: {msgs['error']}")
-                         return
-                         
-                     if not msgs or (isinstance(msgs, str) and "empty" in msgs.lower()):
-                          await callback.message.answer("Inbox is empty.")
-                          return
-
-                     # Cache messages
-                     sms_cache[callback.from_user.id] = msgs
-                     
-                     # Render List UI
-                     await show_sms_list(callback.message, msgs)
-                     return # Handled
-                     
-                 except json.JSONDecodeError:
-                     pass
-                 except Exception as e:
-                     logger.error(f"Error rendering SMS UI: {e}")
+             # Render List UI
+             await show_sms_list(callback.message, msgs)
+             return # Handled
         
         # Standard Tool Execution
         await callback.message.edit_text(f"Running `{req.name}`...", parse_mode="Markdown")
         
-        if hasattr(agent, "execute_tool"):
-             result = await agent.execute_tool(req.name, req.args)
-             import sdk.memory as memory
+        if agent and agent.supports_direct_tools:
+             result = await run_tool(req)
              memory.add_message(callback.from_user.id, "user", f"[Tool Result: {result}]")
         else:
              result = "Error: Agent does not support direct execution."
@@ -253,28 +284,20 @@ async def handle_tool_confirm(callback: CallbackQuery):
             await callback.message.answer(result, reply_markup=keyboard, parse_mode="HTML")
             return
 
-        try:
-            await callback.message.answer(result, parse_mode="Markdown")
-        except TelegramBadRequest:
-             await callback.message.answer(result, parse_mode=None)
+        # Raw tool output: escape it into a <pre> block instead of hoping it is valid Markdown
+        await callback.message.answer(f"<pre>{hd.quote(result)}</pre>", parse_mode="HTML")
     else:
         await callback.message.edit_text("Confirmation expired or invalid.")
 
 async def show_sms_list(message: types.Message, msgs: list):
     """Render the list of SMS buttons."""
-    buttons = []
+    kb = InlineKeyboardBuilder()
     for idx, m in enumerate(msgs):
-        sender = m['sender']
-        # ts: "2024-12-10 22:00:00"
-        ts_parts = m['ts'].split(" ")
-        date_part = ts_parts[0][5:] if len(ts_parts) > 0 else "?"
-        time_part = ts_parts[1][:5] if len(ts_parts) > 1 else "?"
-        
-        label = f"{sender} ({date_part} {time_part})"
-        buttons.append([InlineKeyboardButton(text=label, callback_data=f"view_sms:{idx}")])
-    
-    buttons.append([InlineKeyboardButton(text="❌ Close", callback_data="close_inbox")])
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+        # date_hm: "12-10 22:00", precomputed by sdk.sms
+        kb.button(text=f"{m['sender']} ({m.get('date_hm', '?')})", callback_data=f"view_sms:{idx}")
+    kb.button(text="❌ Close", callback_data="close_inbox")
+    kb.adjust(1)
+    keyboard = kb.as_markup()
 
     try:
         await message.edit_text("📩 **Inbox**", reply_markup=keyboard, parse_mode="Markdown")
@@ -286,22 +309,19 @@ async def handle_view_sms(callback: CallbackQuery):
     user_id = callback.from_user.id
     try:
         idx = int(callback.data.split(":")[1])
-        if user_id in sms_cache and 0 <= idx < len(sms_cache[user_id]):
-            m = sms_cache[user_id][idx]
-            # Wrap content in a code block to handle special characters safely
+        msgs = sms_cache.get(user_id)
+        if msgs and 0 <= idx < len(msgs):
+            m = msgs[idx]
+            # Escaped HTML always parses, so no plain-text retry is needed
             text = (
-                f"📱 **Message Details**\n\n"
-                f"**From:** `{m['sender']}`\n"
-                f"**Time:** `{m['ts']}`\n\n"
-                f"**Content:**\n```\n{m['text']}\n```"
+                f"📱 <b>Message Details</b>\n\n"
+                f"<b>From:</b> <code>{hd.quote(m['sender'])}</code>\n"
+                f"<b>Time:</b> <code>{m['ts']}</code>\n\n"
+                f"<b>Content:</b>\n<pre>{hd.quote(m['text'])}</pre>"
             )
             buttons = [[InlineKeyboardButton(text="🔙 Back to List", callback_data="back_to_sms_list")]]
             keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-            try:
-                await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="Markdown")
-            except TelegramBadRequest:
-                # Fallback to plain text if Markdown fails
-                await callback.message.edit_text(text, reply_markup=keyboard, parse_mode=None)
+            await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
         else:
             await callback.message.edit_text("Has expired details.")
     except Exception as e:
@@ -311,8 +331,9 @@ async def handle_view_sms(callback: CallbackQuery):
 @dp.callback_query(F.data == "back_to_sms_list")
 async def handle_back_sms(callback: CallbackQuery):
     user_id = callback.from_user.id
-    if user_id in sms_cache:
-        await show_sms_list(callback.message, sms_cache[user_id])
+    msgs = sms_cache.get(user_id)
+    if msgs:
+        await show_sms_list(callback.message, msgs)
     else:
         await callback.message.edit_text("Session expired.")
 
@@ -355,9 +376,7 @@ async def handle_delete_msg(callback: CallbackQuery):
 @dp.callback_query(F.data.startswith("cancel_tool:"))
 async def handle_tool_cancel(callback: CallbackQuery):
     req_id = callback.data.split(":")[1]
-    if req_id in pending_tools:
-        del pending_tools[req_id]
-        import sdk.memory as memory
+    if pending_tools.pop(req_id, None):
         memory.add_message(callback.from_user.id, "user", "[Tool Request Cancelled by User]")
     
     try:
@@ -383,7 +402,8 @@ async def handle_message(message: types.Message):
     processing_msg = await message.answer("Thinking...")
     
     try:
-        response = await agent.chat(str(user_id), message.text)
+        async with agent_slots, asyncio.timeout(CHAT_TIMEOUT):
+            response = await agent.chat(str(user_id), message.text)
         
         
         if isinstance(response, ToolRequest):
@@ -408,6 +428,9 @@ async def handle_message(message: types.Message):
         except TelegramBadRequest:
             await processing_msg.edit_text(response, parse_mode=None)
 
+    except TimeoutError:
+        logger.error(f"Agent chat timed out after {CHAT_TIMEOUT}s for {user_id}")
+        await processing_msg.edit_text("⏱️ Timed out waiting for the agent. Please try again.")
     except Exception as e:
         logger.error(f"Error in agent processing: {e!s}")
         await processing_msg.edit_text(f"An internal error occurred: {e!s}")
@@ -415,7 +438,7 @@ async def handle_message(message: types.Message):
 async def main():
     global bot, agent
     
-    logger.add("logs/pico.log", rotation="5 MB", level="INFO")
+    logger.add("logs/pico.log", rotation="5 MB", level="INFO", enqueue=True, catch=True)
     
     if not bot:
         logger.warning("Bot instance not available (Token missing?). Exiting.")
@@ -440,12 +463,17 @@ async def main():
         
         # Initialize Agent
         logger.info("Initializing Default Agent")
-        agent = get_agent(tools=get_tools())
+        agent = get_agent(tools=TOOLS)
         
         logger.info("Starting Telegram Bot Polling...")
         await dp.start_polling(bot)
     except Exception as e:
         logger.error(f"Telegram Bot failed to start: {e}")
+    finally:
+        from sdk.uscis import close_client
+        await close_client()
+        await sdk.http.aclose()
+        await logger.complete()
 
 if __name__ == "__main__":
     try:
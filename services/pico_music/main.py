@@ -3,7 +3,7 @@ import httpx
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, Response
 from pydantic import BaseModel
 
 # Configure logging
@@ -42,6 +42,18 @@ templates = Jinja2Templates(directory="services/pico_music/templates")
 # YTM API Configuration
 YTM_API_BASE_URL = "http://localhost:26538"
 
+@app.on_event("startup")
+async def startup():
+    """Open one pooled client to the YTM API for the lifetime of the app."""
+    app.state.ytm_client = httpx.AsyncClient(
+        base_url=YTM_API_BASE_URL,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        timeout=5.0,
+    )
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.ytm_client.aclose()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -55,8 +67,6 @@ async def proxy_ytm_api(request: Request, path: str):
     Proxy requests to the YTM Desktop API.
     The client sends requests to /proxy/api/v1/..., and we forward them to localhost:26538/api/v1/...
     """
-    target_url = f"{YTM_API_BASE_URL}/{path}"
-    
     # Forward headers
     headers = dict(request.headers)
     headers.pop("host", None)
@@ -66,23 +76,22 @@ async def proxy_ytm_api(request: Request, path: str):
 
 
     try:
-        async with httpx.AsyncClient() as client:
-            # Forward the request body if present
-            content = await request.body()
-            
-            response = await client.request(
-                method=request.method,
-                url=target_url,
-                headers=headers,
-                content=content,
-                timeout=5.0
-            )
-            
-            # Return the response from YTM API
-            return JSONResponse(
-                content=response.json() if response.content else None,
-                status_code=response.status_code,
-            )
+        # Forward the request body if present
+        content = await request.body()
+        
+        response = await app.state.ytm_client.request(
+            method=request.method,
+            url="/" + path,
+            headers=headers,
+            content=content,
+        )
+        
+        # Pass the YTM API body through untouched (no JSON decode/re-encode)
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            media_type=response.headers.get("content-type", "application/json"),
+        )
     except httpx.RequestError as exc:
         logger.error(f"An error occurred while requesting {exc.request.url!r}.")
         raise HTTPException(status_code=502, detail="Error connecting to YTM API")
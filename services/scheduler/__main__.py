@@ -2,10 +2,15 @@ import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from loguru import logger
 
+import sdk.http
+from sdk.uscis import close_client
 from services.scheduler.tasks.temp import monitor_system_temp
 from services.scheduler.tasks.uscis import monitor_uscis
 
-scheduler = AsyncIOScheduler()
+# Never overlap runs of the same job, and collapse a backlog of missed runs into one
+JOB_DEFAULTS = {"coalesce": True, "max_instances": 1, "misfire_grace_time": 120}
+
+scheduler = AsyncIOScheduler(job_defaults=JOB_DEFAULTS)
 
 def start_scheduler():
     logger.info("Starting Refactored Scheduler...")
@@ -27,7 +32,7 @@ def stop_scheduler():
     scheduler.shutdown()
 
 async def main():
-    logger.add("logs/pico.log", rotation="5 MB", level="INFO")
+    logger.add("logs/pico.log", rotation="5 MB", level="INFO", enqueue=True, catch=True)
     logger.info("Initializing Pico Scheduler Service (Integrated)...")
     start_scheduler()
     
@@ -36,6 +41,10 @@ async def main():
             await asyncio.sleep(3600)
     except asyncio.CancelledError:
         stop_scheduler()
+    finally:
+        await close_client()
+        await sdk.http.aclose()
+        await logger.complete()
 
 if __name__ == "__main__":
     try:
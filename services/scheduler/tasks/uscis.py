@@ -1,26 +1,24 @@
-import os
-import json
+import asyncio
 from loguru import logger
-from sdk.uscis import UscisClient
+from sdk.uscis import get_client, load_state, save_state
 from sdk.bark import bark
 
 STATE_FILE = "data/uscis_state.json"
 
 async def monitor_uscis():
     """Check USCIS status and notify if changed."""
-    client = UscisClient()
     try:
+        # Shared across runs; closed on scheduler shutdown
+        client = await get_client()
         new_statuses = await client.check_all()
         if not new_statuses:
             return
 
         old_statuses = {}
-        if os.path.exists(STATE_FILE):
-            try:
-                with open(STATE_FILE, 'r') as f:
-                    old_statuses = json.load(f)
-            except Exception as e:
-                logger.error(f"Failed to load USCIS state: {e}")
+        try:
+            old_statuses = await asyncio.to_thread(load_state, STATE_FILE)
+        except Exception as e:
+            logger.error(f"Failed to load USCIS state: {e}")
 
         changes = []
         # We will merge new results into the global state
@@ -51,10 +49,9 @@ async def monitor_uscis():
             elif not old_update_at and new_data:
                  logger.info(f"First status capture for {case_num}")
 
-        # Save merged state
-        os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
-        with open(STATE_FILE, 'w') as f:
-            json.dump(merged_state, f, indent=2, ensure_ascii=False)
+        # Save merged state, skipping the rewrite on the common nothing-changed run
+        if merged_state != old_statuses:
+            await asyncio.to_thread(save_state, STATE_FILE, merged_state)
 
         if changes:
             msg = "\n\n".join(changes)
@@ -63,5 +60,3 @@ async def monitor_uscis():
             
     except Exception as e:
         logger.error(f"USCIS Scheduler Job Error: {e}")
-    finally:
-        await client.close()
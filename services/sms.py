@@ -1,10 +1,11 @@
 import asyncio
 from loguru import logger
+import sdk.http
 import sdk.sms
 from sdk.bark import bark
 
 async def main():
-    logger.add("logs/pico.log", rotation="5 MB", level="INFO")
+    logger.add("logs/pico.log", rotation="5 MB", level="INFO", enqueue=True, catch=True)
     logger.info("Initializing SMS Service...")
     
     try:
@@ -21,6 +22,9 @@ async def main():
             
     except asyncio.CancelledError:
         logger.info("SMS Service stopping...")
+    finally:
+        await sdk.http.aclose()
+        await logger.complete()
 
 if __name__ == "__main__":
     try: